@@ -0,0 +1,80 @@
+import grpc
+import threading
+import time
+from datetime import datetime
+import stats_pb2
+from stats_client import CoalescingStatsClient
+
+# 使用标准服务名称
+SERVICE_NAME = "v2ray.core.app.stats.command.StatsService"
+
+# 配置信息
+API_ADDR = "127.0.0.1:8080"  # sing-box API 地址
+INTERVAL = 5                 # 汇报间隔（秒）
+
+# 消费者: (名称, 查询间隔秒数, 查询方式, 参数)
+CONSUMERS = [
+    ("代理出站", 0.5, "get", "outbound>>>🌐代理>>>traffic>>>downlink"),
+    ("直连出站", 0.5, "get", "outbound>>>➡️直连>>>traffic>>>downlink"),
+    ("入站", 1, "query", ["inbound>>>mixed-in>>>"]),
+    ("全部用户", 2, "regexp", ["^user>>>"]),
+    ("全部统计", 5, "query", []),
+]
+
+class StandardStatsServiceStub:
+    """使用标准服务名称的存根"""
+    def __init__(self, channel):
+        self.channel = channel
+
+    def QueryStats(self, request):
+        """自定义 QueryStats 方法"""
+        method_path = f'/{SERVICE_NAME}/QueryStats'
+        return self.channel.unary_unary(
+            method_path,
+            request_serializer=stats_pb2.QueryStatsRequest.SerializeToString,
+            response_deserializer=stats_pb2.QueryStatsResponse.FromString
+        )(request)
+
+def run_consumer(client, name, interval, kind, arg, stop):
+    """按固定间隔查询，模拟独立的监控消费者"""
+    while not stop.is_set():
+        try:
+            if kind == "get":
+                client.get_stats(arg)
+            else:
+                client.query_stats(arg, regexp=(kind == "regexp"))
+        except grpc.RpcError as e:
+            print(f"[错误] {name} 查询失败: {e.details()}")
+        stop.wait(interval)
+
+def main():
+    print("=" * 70)
+    print("Sing-box 多消费者合并查询")
+    print("=" * 70)
+    print(f"API 地址: {API_ADDR}")
+    print(f"消费者: {', '.join(name for name, *_ in CONSUMERS)}")
+    print("按 Ctrl+C 停止")
+    print("=" * 70)
+
+    channel = grpc.insecure_channel(API_ADDR)
+    client = CoalescingStatsClient(StandardStatsServiceStub(channel))
+    stop = threading.Event()
+
+    threads = [
+        threading.Thread(target=run_consumer, args=(client, *consumer, stop), daemon=True)
+        for consumer in CONSUMERS
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            time.sleep(INTERVAL)
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            print(f"[{timestamp}] 消费者请求 {client.requests} 次, 实际调用 API {client.upstream_calls} 次")
+    except KeyboardInterrupt:
+        print("\n已停止")
+        stop.set()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import multiprocessing
+import random
+import time
+import stats_pb2
+from stats_records import TrafficTable
+from stats_shard import ShardedParser
+
+# 配置信息
+TAGS = 100000                # 模拟的标签数量（每个标签上下行两个统计项）
+ROUNDS = 10                  # 每种配置测量的轮数
+PROCESS_COUNTS = [1, 2, 4, 8]  # 测量的解析进程数，超过 CPU 核数的配置会跳过
+GROUPS = {
+    "代理": {"outbound": ["HK-*", "JP-*"]},
+    "客户": {"user": ["*@corp.com"]},
+}
+
+def build_payload(tags, seed=0):
+    """生成与 sing-box 返回格式相同的 QueryStatsResponse 字节"""
+    rnd = random.Random(seed)
+    response = stats_pb2.QueryStatsResponse()
+    names = []
+    for i in range(tags):
+        if i % 3 == 0:
+            tag = f"inbound>>>in-{i}"
+        elif i % 3 == 1:
+            tag = f"outbound>>>{'HK' if i % 2 else 'JP'}-{i}"
+        else:
+            tag = f"user>>>u{i}@corp.com"
+        names.append(f"{tag}>>>traffic>>>uplink")
+        names.append(f"{tag}>>>traffic>>>downlink")
+    # 与 Go map 遍历一样顺序随机
+    rnd.shuffle(names)
+    for name in names:
+        response.stat.add(name=name, value=rnd.randrange(1, 1 << 40))
+    return response.SerializeToString()
+
+def measure(parse, payload, rounds):
+    """预热一轮后测量，返回 (每轮墙钟时间, 每轮主进程 CPU 时间)"""
+    parse(payload)
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(rounds):
+        parse(payload)
+    return (time.perf_counter() - wall) / rounds, (time.process_time() - cpu) / rounds
+
+def print_row(label, cores, stats, wall, cpu, baseline, worker_cpu=None):
+    throughput = stats / wall
+    worker = f"{worker_cpu * 1000:>10.1f}" if worker_cpu is not None else f"{'-':>10}"
+    print(f"{label:<12} {1 / wall:>8.2f} {throughput:>12,.0f} {throughput / cores:>12,.0f} "
+          f"{baseline / wall:>6.2f}x {cpu * 1000:>10.1f} {worker}")
+
+def main():
+    cpus = multiprocessing.cpu_count()
+    payload = build_payload(TAGS)
+    stats = 2 * TAGS
+
+    print("=" * 80)
+    print("Sing-box 分片解析基准测试")
+    print("=" * 80)
+    print(f"CPU 核数: {cpus}")
+    print(f"统计项数: {stats:,}  响应大小: {len(payload) / 1048576:.1f} MB  每种配置 {ROUNDS} 轮")
+    print("=" * 80)
+    print(f"{'配置':<12} {'快照/秒':>8} {'统计项/秒':>12} {'每核统计项/秒':>12} "
+          f"{'加速比':>7} {'主进程ms':>10} {'工作进程ms':>10}")
+    print("-" * 80)
+
+    # 基准: 主进程内反序列化并更新 TrafficTable
+    table = TrafficTable()
+    wall, cpu = measure(lambda data: table.update(stats_pb2.QueryStatsResponse.FromString(data)), payload, ROUNDS)
+    baseline = wall
+    print_row("单进程", 1, stats, wall, cpu, baseline)
+
+    for processes in PROCESS_COUNTS:
+        if processes > cpus:
+            print(f"{processes} 进程: 超过 CPU 核数，跳过")
+            continue
+        parser = ShardedParser(processes, GROUPS)
+        table = TrafficTable()
+        try:
+            wall, cpu = measure(lambda data: parser.parse(data, table), payload, ROUNDS)
+            worker_cpu = max(parser.worker_cpu) if parser.worker_cpu else None
+            print_row(f"分片 {processes} 进程", max(processes, 1), stats, wall, cpu, baseline, worker_cpu)
+        finally:
+            parser.close()
+    print("=" * 80)
+    print("每核统计项/秒 = 统计项/秒 ÷ 参与解析的进程数；工作进程ms 为最慢分片的 CPU 时间")
+
+if __name__ == "__main__":
+    main()
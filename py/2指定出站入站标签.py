@@ -1,13 +1,13 @@
 import grpc
 import time
 from datetime import datetime
-import re
 import sys
 import stats_pb2
 import stats_pb2_grpc
-
-# 流量统计正则表达式
-TRAFFIC_REGEX = re.compile(r"(inbound|outbound|user)>>>([^>]+)>>>traffic>>>(downlink|uplink)")
+from stats_delta import DeltaTracker
+from stats_groups import GroupIndex
+from stats_anomaly import AnomalyDetector
+from stats_records import TrafficTable
 
 # 使用标准服务名称
 SERVICE_NAME = "v2ray.core.app.stats.command.StatsService"
@@ -23,6 +23,14 @@ MONITORED_OUTBOUNDS = [
     "🌐代理", "➡️直连", "CN"
 ]
 
+# 标签分组，支持通配符和分组嵌套（统计自监控启动起的流量）
+TRAFFIC_GROUPS = {
+    "代理": {"outbound": ["🌐代理"]},
+    "直连": {"outbound": ["➡️直连", "CN"]},
+    "全部出站": {"groups": ["代理", "直连"]},
+    "全部用户": {"user": ["*"]},
+}
+
 def format_bytes(size):
     """格式化字节大小为易读格式"""
     if size <= 0:
@@ -45,10 +53,9 @@ def print_stats_table(title, stats):
     print(f"{'名称':<25} {'方向':<8} {'流量':>15}")
     print("-" * 70)
     
-    for name, data in stats.items():
-        for direction, value in data.items():
-            formatted_value = format_bytes(value)
-            print(f"{name:<25} {direction:<8} {formatted_value:>15}")
+    for record in stats:
+        print(f"{record.tag:<25} {'uplink':<8} {format_bytes(record.uplink):>15}")
+        print(f"{record.tag:<25} {'downlink':<8} {format_bytes(record.downlink):>15}")
     
     print("-" * 70)
 
@@ -69,44 +76,18 @@ class StatsServiceStub:
             response_deserializer=stats_pb2.QueryStatsResponse.FromString
         )(request)
 
-def get_traffic_data(response):
-    """解析流量统计数据"""
-    user_stats = {}
-    inbound_stats = {}
-    outbound_stats = {}
-    
-    for stat in response.stat:
-        if stat.value <= 0:
-            continue
-        
-        # 解析统计项名称
-        match = TRAFFIC_REGEX.match(stat.name)
-        if not match or len(match.groups()) < 3:
-            continue
-        
-        resource = match.group(1)   # inbound/outbound/user
-        tag = match.group(2)        # 用户邮箱或入站标签
-        direction = match.group(3)  # downlink/uplink
-        
-        # 处理用户流量
-        if resource == "user":
-            if tag not in user_stats:
-                user_stats[tag] = {"uplink": 0, "downlink": 0}
-            user_stats[tag][direction] += stat.value
-        
-        # 处理入站流量
-        elif resource == "inbound" and tag in MONITORED_INBOUNDS:
-            if tag not in inbound_stats:
-                inbound_stats[tag] = {"uplink": 0, "downlink": 0}
-            inbound_stats[tag][direction] += stat.value
-        
-        # 处理出站流量
-        elif resource == "outbound" and tag in MONITORED_OUTBOUNDS:
-            if tag not in outbound_stats:
-                outbound_stats[tag] = {"uplink": 0, "downlink": 0}
-            outbound_stats[tag][direction] += stat.value
-    
-    return user_stats, inbound_stats, outbound_stats
+def is_monitored(resource, tag):
+    """判断标签是否需要统计，每个统计项名称只判断一次"""
+    if resource == "inbound":
+        return tag in MONITORED_INBOUNDS
+    if resource == "outbound":
+        return tag in MONITORED_OUTBOUNDS
+    return True
+
+def get_traffic_data(table, response):
+    """解析流量统计数据，复用上一轮的记录对象"""
+    table.update(response)
+    return table.current("user"), table.current("inbound"), table.current("outbound")
 
 def main():
     print("=" * 70)
@@ -118,6 +99,7 @@ def main():
     print(f"重置计数器: {'是' if RESET_COUNTERS else '否'}")
     print(f"监控入站: {', '.join(MONITORED_INBOUNDS)}")
     print(f"监控出站: {', '.join(MONITORED_OUTBOUNDS)}")
+    print(f"监控分组: {', '.join(TRAFFIC_GROUPS)}")
     print("按 Ctrl+C 停止监控")
     print("=" * 70)
     
@@ -128,6 +110,13 @@ def main():
         # 创建自定义存根
         stub = StatsServiceStub(channel)
         
+        # 分组总流量按增量累加，无需每次重新计算
+        traffic_table = TrafficTable(is_monitored)
+        tracker = DeltaTracker(RESET_COUNTERS, table=traffic_table)
+        first_poll = not RESET_COUNTERS
+        group_index = GroupIndex(TRAFFIC_GROUPS)
+        detector = AnomalyDetector(traffic_table)
+        
         # 主监控循环
         while True:
             try:
@@ -142,7 +131,14 @@ def main():
                 response = stub.QueryStats(request)
                 
                 # 解析统计数据
-                user_stats, inbound_stats, outbound_stats = get_traffic_data(response)
+                user_stats, inbound_stats, outbound_stats = get_traffic_data(traffic_table, response)
+                if first_poll:
+                    # 首轮只建立基线，分组总流量从监控启动时开始累计
+                    tracker.prime(response)
+                    first_poll = False
+                changes = tracker.update(response)
+                group_stats = group_index.update(changes)
+                events = detector.update(tracker.ids, tracker.deltas, time.time())
                 
                 # 打印结果
                 print(f"\n[{timestamp}] 流量统计")
@@ -152,8 +148,8 @@ def main():
                     print_stats_table("用户流量", user_stats)
                     
                     # 计算用户总流量
-                    total_up = sum(data["uplink"] for data in user_stats.values())
-                    total_down = sum(data["downlink"] for data in user_stats.values())
+                    total_up = sum(record.uplink for record in user_stats)
+                    total_down = sum(record.downlink for record in user_stats)
                     print(f"用户总上传: {format_bytes(total_up)}")
                     print(f"用户总下载: {format_bytes(total_down)}")
                     print(f"用户总流量: {format_bytes(total_up + total_down)}")
@@ -163,8 +159,8 @@ def main():
                     print_stats_table("入站流量", inbound_stats)
                     
                     # 计算入站总流量
-                    total_in_up = sum(data["uplink"] for data in inbound_stats.values())
-                    total_in_down = sum(data["downlink"] for data in inbound_stats.values())
+                    total_in_up = sum(record.uplink for record in inbound_stats)
+                    total_in_down = sum(record.downlink for record in inbound_stats)
                     print(f"入站总上传: {format_bytes(total_in_up)}")
                     print(f"入站总下载: {format_bytes(total_in_down)}")
                 
@@ -173,11 +169,25 @@ def main():
                     print_stats_table("出站流量", outbound_stats)
                     
                     # 计算出站总流量
-                    total_out_up = sum(data["uplink"] for data in outbound_stats.values())
-                    total_out_down = sum(data["downlink"] for data in outbound_stats.values())
+                    total_out_up = sum(record.uplink for record in outbound_stats)
+                    total_out_down = sum(record.downlink for record in outbound_stats)
                     print(f"出站总上传: {format_bytes(total_out_up)}")
                     print(f"出站总下载: {format_bytes(total_out_down)}")
                 
+                # 分组流量统计
+                if any(record.total for record in group_stats.values()):
+                    print_stats_table("分组流量", list(group_stats.values()))
+                
+                # 流量异常告警
+                for event in events:
+                    resource, tag, direction = event["key"]
+                    if event["type"] == "spike":
+                        print(f"[告警] {resource} '{tag}' {direction} 流量突增: "
+                              f"{format_bytes(event['rate'])}/s (均值 {format_bytes(event['mean'])}/s, z={event['z']:.1f})")
+                    else:
+                        print(f"[告警] {resource} '{tag}' {direction} 流量中断 "
+                              f"(均值 {format_bytes(event['mean'])}/s)")
+                
                 # 如果没有数据
                 if not user_stats and not inbound_stats and not outbound_stats:
                     print("未检测到流量数据")
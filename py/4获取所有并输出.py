@@ -1,13 +1,11 @@
 import grpc
 import time
 from datetime import datetime
-import re
 import sys
 import stats_pb2
 import stats_pb2_grpc
-
-# 流量统计正则表达式
-TRAFFIC_REGEX = re.compile(r"(inbound|outbound|user)>>>([^>]+)>>>traffic>>>(downlink|uplink)")
+from stats_records import TrafficTable
+from stats_shard import ShardedParser
 
 # 使用标准服务名称
 SERVICE_NAME = "v2ray.core.app.stats.command.StatsService"
@@ -34,16 +32,18 @@ def print_stats_table(title, stats):
     print(f"{'用户/标签':<30} {'方向':<8} {'流量':>15}")
     print("-" * 70)
     
-    for data in stats.values():
-        formatted_value = format_bytes(data["value"])
-        print(f"{data['tag']:<30} {data['direction']:<8} {formatted_value:>15}")
+    for record in stats:
+        if record.uplink > 0:
+            print(f"{record.tag:<30} {'uplink':<8} {format_bytes(record.uplink):>15}")
+        if record.downlink > 0:
+            print(f"{record.tag:<30} {'downlink':<8} {format_bytes(record.downlink):>15}")
     
     print("-" * 70)
 
 def calculate_totals(stats):
     """计算总流量"""
-    total_up = sum(d["value"] for d in stats.values() if d["direction"] == "uplink")
-    total_down = sum(d["value"] for d in stats.values() if d["direction"] == "downlink")
+    total_up = sum(record.uplink for record in stats)
+    total_down = sum(record.downlink for record in stats)
     total_all = total_up + total_down
     return total_up, total_down, total_all
 
@@ -64,11 +64,21 @@ class StandardStatsServiceStub:
             response_deserializer=stats_pb2.QueryStatsResponse.FromString
         )(request)
 
+    def QueryStatsRaw(self, request):
+        """返回未反序列化的响应字节，用于多进程分片解析"""
+        method_path = f'/{SERVICE_NAME}/QueryStats'
+        return self.channel.unary_unary(
+            method_path,
+            request_serializer=stats_pb2.QueryStatsRequest.SerializeToString,
+            response_deserializer=None
+        )(request)
+
 def main():
     # 配置信息
     api_addr = "127.0.0.1:8080"  # sing-box API 地址
     reset_counters = False        # 是否重置计数器
     interval = 5                  # 刷新间隔（秒）
+    parse_processes = 0           # 分片解析的进程数，0 表示单进程
     
     print("=" * 70)
     print("Sing-box 流量监控 (标准 V2Ray API)")
@@ -77,9 +87,13 @@ def main():
     print(f"服务名称: {SERVICE_NAME}")
     print(f"刷新间隔: {interval} 秒")
     print(f"重置计数器: {'是' if reset_counters else '否'}")
+    print(f"解析进程数: {parse_processes or 1}")
     print("按 Ctrl+C 停止监控")
     print("=" * 70)
     
+    # 工作进程需在创建 gRPC 通道之前启动
+    parser = ShardedParser(parse_processes) if parse_processes > 1 else None
+    
     try:
         # 创建 gRPC 通道
         channel = grpc.insecure_channel(api_addr)
@@ -87,6 +101,9 @@ def main():
         # 创建自定义存根
         stub = StandardStatsServiceStub(channel)
         
+        # 解析结果按统计项名称缓存，记录对象在轮询间复用
+        traffic_table = TrafficTable()
+        
         # 主监控循环
         while True:
             try:
@@ -95,40 +112,15 @@ def main():
                 
                 # 查询流量统计
                 request = stats_pb2.QueryStatsRequest(reset=reset_counters)
-                response = stub.QueryStats(request)
                 
                 # 解析统计数据
-                user_stats = {}
-                inbound_stats = {}
-                outbound_stats = {}
-                
-                for stat in response.stat:
-                    if stat.value <= 0:
-                        continue
-                    
-                    # 使用正则表达式解析
-                    match = TRAFFIC_REGEX.match(stat.name)
-                    if not match or len(match.groups()) < 3:
-                        continue
-                    
-                    resource = match.group(1)
-                    tag = match.group(2)
-                    direction = match.group(3)
-                    
-                    # 根据资源类型分类存储
-                    key = f"{tag}_{direction}"
-                    stat_data = {
-                        "tag": tag, 
-                        "direction": direction, 
-                        "value": stat.value
-                    }
-                    
-                    if resource == "user":
-                        user_stats[key] = stat_data
-                    elif resource == "inbound":
-                        inbound_stats[key] = stat_data
-                    elif resource == "outbound":
-                        outbound_stats[key] = stat_data
+                if parser:
+                    parser.parse(stub.QueryStatsRaw(request), traffic_table)
+                else:
+                    traffic_table.update(stub.QueryStats(request))
+                user_stats = traffic_table.current("user")
+                inbound_stats = traffic_table.current("inbound")
+                outbound_stats = traffic_table.current("outbound")
                 
                 # 打印结果
                 print(f"\n[{timestamp}] 流量统计")
@@ -190,6 +182,9 @@ def main():
         print("\n监控已停止")
     except Exception as e:
         print(f"发生未处理错误: {str(e)}")
+    finally:
+        if parser:
+            parser.close()
 
 if __name__ == "__main__":
     main()
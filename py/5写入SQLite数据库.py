@@ -0,0 +1,111 @@
+import grpc
+import sqlite3
+import time
+from datetime import datetime
+import stats_pb2
+from stats_delta import DeltaTracker
+from stats_sink import SQLiteSink
+
+# 使用标准服务名称
+SERVICE_NAME = "v2ray.core.app.stats.command.StatsService"
+
+# 配置信息
+API_ADDR = "127.0.0.1:8080"  # sing-box API 地址
+RESET_COUNTERS = False       # 是否重置计数器
+INTERVAL = 5                 # 刷新间隔（秒）
+DB_PATH = "traffic.db"       # SQLite 数据库文件
+
+# 报表查询示例（按用户统计本月流量）:
+#   SELECT c.tag, c.direction, SUM(r.value)
+#   FROM rollup_daily r JOIN counters c ON c.id = r.counter_id
+#   WHERE c.resource = 'user' AND r.bucket >= strftime('%s', 'now', 'localtime', 'start of month', 'utc')
+#   GROUP BY c.tag, c.direction;
+
+class StandardStatsServiceStub:
+    """使用标准服务名称的存根"""
+    def __init__(self, channel):
+        self.channel = channel
+
+    def QueryStats(self, request):
+        """自定义 QueryStats 方法"""
+        method_path = f'/{SERVICE_NAME}/QueryStats'
+        return self.channel.unary_unary(
+            method_path,
+            request_serializer=stats_pb2.QueryStatsRequest.SerializeToString,
+            response_deserializer=stats_pb2.QueryStatsResponse.FromString
+        )(request)
+
+def main():
+    print("=" * 70)
+    print("Sing-box 流量记录 (SQLite)")
+    print("=" * 70)
+    print(f"API 地址: {API_ADDR}")
+    print(f"服务名称: {SERVICE_NAME}")
+    print(f"刷新间隔: {INTERVAL} 秒")
+    print(f"重置计数器: {'是' if RESET_COUNTERS else '否'}")
+    print(f"数据库: {DB_PATH}")
+    print("按 Ctrl+C 停止记录")
+    print("=" * 70)
+
+    sink = SQLiteSink(DB_PATH)
+
+    try:
+        # 创建 gRPC 通道
+        channel = grpc.insecure_channel(API_ADDR)
+        stub = StandardStatsServiceStub(channel)
+
+        # 从数据库恢复上次的累计值，避免重启后重复计算
+        tracker = DeltaTracker(RESET_COUNTERS, sink.load_last_values())
+        first_poll = not RESET_COUNTERS
+
+        # 主监控循环
+        while True:
+            try:
+                now = time.time()
+                timestamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+
+                # 查询流量统计
+                request = stats_pb2.QueryStatsRequest(
+                    pattern=">>>traffic>>>",
+                    reset=RESET_COUNTERS
+                )
+                response = stub.QueryStats(request)
+
+                # 计算增量并写入数据库
+                if first_poll:
+                    # 数据库中没有累计值的计数器只建立基线，避免把 sing-box 启动以来的流量记入当前小时
+                    tracker.prime(response)
+                    first_poll = False
+                changes = tracker.update(response)
+                try:
+                    written = sink.write(changes, now)
+                except sqlite3.Error:
+                    # 写入失败时回退累计值，下次轮询重新计算这部分增量
+                    tracker.rollback()
+                    raise
+                total = sum(delta for _, delta, _ in changes)
+                print(f"[{timestamp}] 写入 {written} 条增量, 共 {total} 字节")
+
+                # 等待下一次查询
+                time.sleep(INTERVAL)
+
+            except grpc.RpcError as e:
+                error_msg = e.details()
+                print(f"\n[错误] gRPC 连接失败: {error_msg}")
+                print("等待 10 秒后重试...")
+                time.sleep(10)
+
+            except Exception as e:
+                print(f"\n[错误] 发生异常: {str(e)}")
+                print("等待 10 秒后重试...")
+                time.sleep(10)
+
+    except KeyboardInterrupt:
+        print("\n记录已停止")
+    except Exception as e:
+        print(f"发生未处理错误: {str(e)}")
+    finally:
+        sink.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import sqlite3
+import time
+from datetime import datetime
+from stats_billing import BillingStore
+
+# 配置信息
+DB_PATH = "traffic.db"       # 由 5写入SQLite数据库.py 生成的数据库
+BILLING_YEAR = None          # 账期年份，None 表示当月
+BILLING_MONTH = None         # 账期月份，None 表示当月
+ROLLING_DAYS = 30            # 滚动窗口天数
+
+def format_bytes(size):
+    """格式化字节大小为易读格式"""
+    if size <= 0:
+        return "0 B"
+
+    units = ['B', 'KB', 'MB', 'GB', 'TB']
+    unit_idx = 0
+    while size >= 1024 and unit_idx < len(units) - 1:
+        size /= 1024.0
+        unit_idx += 1
+    return f"{size:.2f} {units[unit_idx]}"
+
+def main():
+    today = datetime.now()
+    year = BILLING_YEAR or today.year
+    month = BILLING_MONTH or today.month
+
+    print("=" * 80)
+    print("Sing-box 用户账期流量")
+    print("=" * 80)
+    print(f"数据库: {DB_PATH}")
+    print(f"账期: {year}-{month:02d}")
+    print(f"滚动窗口: 最近 {ROLLING_DAYS} 天")
+    print("=" * 80)
+
+    try:
+        now = time.time()
+        store = BillingStore()
+        month_start, month_end = store.month_range(year, month)
+        rolling_start, rolling_end = store.rolling_range(ROLLING_DAYS, now)
+
+        # 只加载账期和滚动窗口覆盖的时间段
+        conn = sqlite3.connect(DB_PATH)
+        start = time.time()
+        store.load(conn, month_start, month_end)
+        store.load(conn, rolling_start, rolling_end)
+        conn.close()
+        loaded = time.time()
+
+        invoice = store.invoice(year, month)
+        print(f"\n{'用户':<30} {'账期上传':>12} {'账期下载':>12} {'账期合计':>12} {f'{ROLLING_DAYS}天合计':>12}")
+        print("-" * 80)
+        for user in sorted(invoice):
+            data = invoice[user]
+            rolling = store.rolling_usage(user, ROLLING_DAYS, now)
+            print(
+                f"{user:<30} {format_bytes(data['uplink']):>12} {format_bytes(data['downlink']):>12} "
+                f"{format_bytes(data['uplink'] + data['downlink']):>12} "
+                f"{format_bytes(rolling['uplink'] + rolling['downlink']):>12}"
+            )
+        print("-" * 80)
+
+        total_up = sum(data["uplink"] for data in invoice.values())
+        total_down = sum(data["downlink"] for data in invoice.values())
+        print(f"用户数: {len(invoice)}")
+        print(f"账期总上传: {format_bytes(total_up)}")
+        print(f"账期总下载: {format_bytes(total_down)}")
+        print(f"加载耗时: {loaded - start:.2f} 秒, 结算耗时: {time.time() - loaded:.2f} 秒")
+
+    except sqlite3.Error as e:
+        print(f"[错误] 读取数据库失败: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import grpc
+import re
+import time
+import stats_pb2
+from stats_index import StatIndex
+
+# 使用标准服务名称
+SERVICE_NAME = "v2ray.core.app.stats.command.StatsService"
+
+# 配置信息
+API_ADDR = "127.0.0.1:8080"  # sing-box API 地址
+REFRESH_INTERVAL = 5         # 快照刷新间隔（秒）
+
+def format_bytes(size):
+    """格式化字节大小为易读格式"""
+    if size <= 0:
+        return "0 B"
+
+    units = ['B', 'KB', 'MB', 'GB', 'TB']
+    unit_idx = 0
+    while size >= 1024 and unit_idx < len(units) - 1:
+        size /= 1024.0
+        unit_idx += 1
+    return f"{size:.2f} {units[unit_idx]}"
+
+class StandardStatsServiceStub:
+    """使用标准服务名称的存根"""
+    def __init__(self, channel):
+        self.channel = channel
+
+    def QueryStats(self, request):
+        """自定义 QueryStats 方法"""
+        method_path = f'/{SERVICE_NAME}/QueryStats'
+        return self.channel.unary_unary(
+            method_path,
+            request_serializer=stats_pb2.QueryStatsRequest.SerializeToString,
+            response_deserializer=stats_pb2.QueryStatsResponse.FromString
+        )(request)
+
+def run_query(index, text):
+    """根据输入前缀选择查询方式"""
+    if text.startswith("re:"):
+        return index.regexp(text[3:])
+    if text.startswith("prefix:"):
+        return index.prefix(text[7:])
+    if text.startswith("has:"):
+        return index.query([p for p in text[4:].split(",") if p])
+    return index.glob(text)
+
+def main():
+    print("=" * 70)
+    print("Sing-box 统计项本地查询")
+    print("=" * 70)
+    print(f"API 地址: {API_ADDR}")
+    print(f"快照刷新间隔: {REFRESH_INTERVAL} 秒")
+    print("查询语法:")
+    print("  user>>>*@corp.com>>>*      通配符")
+    print("  prefix:outbound>>>HK-      前缀")
+    print("  re:^user>>>.*>>>uplink$    正则")
+    print("  has:HK-,mixed              子串（同 QueryStats patterns）")
+    print("输入空行或按 Ctrl+C 退出")
+    print("=" * 70)
+
+    channel = grpc.insecure_channel(API_ADDR)
+    stub = StandardStatsServiceStub(channel)
+    index = StatIndex()
+    last_refresh = 0
+
+    try:
+        while True:
+            text = input("\n查询> ").strip()
+            if not text:
+                break
+
+            try:
+                # 快照过期时重新拉取全部统计项
+                if time.time() - last_refresh >= REFRESH_INTERVAL:
+                    response = stub.QueryStats(stats_pb2.QueryStatsRequest(reset=False))
+                    index.update(response)
+                    last_refresh = time.time()
+
+                start = time.perf_counter()
+                result = run_query(index, text)
+                elapsed = (time.perf_counter() - start) * 1000
+
+                for name in sorted(result):
+                    print(f"{name:<60} {format_bytes(result[name]):>15}")
+                print(f"共 {len(result)} 项 / {len(index)} 项, 耗时 {elapsed:.2f} ms")
+
+            except grpc.RpcError as e:
+                print(f"[错误] gRPC 连接失败: {e.details()}")
+            except re.error as e:
+                print(f"[错误] 正则表达式无效: {str(e)}")
+
+    except (KeyboardInterrupt, EOFError):
+        pass
+    print("\n查询已退出")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import grpc
+import time
+from datetime import datetime
+import stats_pb2
+from stats_replay import Recorder, QUERY_STATS, SYS_STATS
+
+# 使用标准服务名称
+SERVICE_NAME = "v2ray.core.app.stats.command.StatsService"
+
+# 配置信息
+API_ADDR = "127.0.0.1:8080"  # sing-box API 地址
+INTERVAL = 5                 # 录制间隔（秒）
+RECORD_PATH = "traffic.rec"  # 录制文件，已存在时追加
+
+class RawStatsServiceStub:
+    """返回原始响应字节的存根，不做反序列化"""
+    def __init__(self, channel):
+        self.channel = channel
+
+    def QueryStats(self, request):
+        method_path = f'/{SERVICE_NAME}/QueryStats'
+        return self.channel.unary_unary(
+            method_path,
+            request_serializer=stats_pb2.QueryStatsRequest.SerializeToString,
+            response_deserializer=None
+        )(request)
+
+    def GetSysStats(self, request):
+        method_path = f'/{SERVICE_NAME}/GetSysStats'
+        return self.channel.unary_unary(
+            method_path,
+            request_serializer=stats_pb2.SysStatsRequest.SerializeToString,
+            response_deserializer=None
+        )(request)
+
+def main():
+    print("=" * 70)
+    print("Sing-box 原始响应录制")
+    print("=" * 70)
+    print(f"API 地址: {API_ADDR}")
+    print(f"服务名称: {SERVICE_NAME}")
+    print(f"录制间隔: {INTERVAL} 秒")
+    print(f"录制文件: {RECORD_PATH}")
+    print("按 Ctrl+C 停止录制")
+    print("=" * 70)
+
+    recorder = Recorder(RECORD_PATH)
+
+    try:
+        channel = grpc.insecure_channel(API_ADDR)
+        stub = RawStatsServiceStub(channel)
+
+        while True:
+            try:
+                now = time.time()
+                timestamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+
+                # 录制完整统计项和系统状态（不重置计数器）
+                stats = stub.QueryStats(stats_pb2.QueryStatsRequest(reset=False))
+                recorder.write(QUERY_STATS, stats, now)
+                sys_stats = stub.GetSysStats(stats_pb2.SysStatsRequest())
+                recorder.write(SYS_STATS, sys_stats, now)
+                recorder.flush()
+
+                print(f"[{timestamp}] 已录制 {recorder.frames} 帧, 本次 {len(stats)} 字节")
+                time.sleep(INTERVAL)
+
+            except grpc.RpcError as e:
+                error_msg = e.details()
+                print(f"\n[错误] gRPC 连接失败: {error_msg}")
+                print("等待 10 秒后重试...")
+                time.sleep(10)
+
+    except KeyboardInterrupt:
+        print("\n录制已停止")
+    finally:
+        recorder.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import time
+import stats_pb2
+from stats_anomaly import AnomalyDetector
+from stats_delta import DeltaTracker
+from stats_groups import GroupIndex
+from stats_records import TrafficTable
+from stats_replay import read_frames, replay, QUERY_STATS, SYS_STATS
+from stats_sink import SQLiteSink
+
+# 配置信息
+RECORD_PATH = "traffic.rec"  # 由 8录制原始响应.py 生成的录制文件
+SPEED = 0                    # 回放倍速: 1 为原速, 10 为 10 倍速, 0 为全速
+DB_PATH = ":memory:"         # SQLite 数据库，None 表示不写入
+REPORT_EVERY = 100           # 每回放多少个快照输出一次进度
+
+# 与监控脚本相同的分组配置
+TRAFFIC_GROUPS = {
+    "代理": {"outbound": ["🌐代理"]},
+    "直连": {"outbound": ["➡️直连", "CN"]},
+    "全部出站": {"groups": ["代理", "直连"]},
+    "全部用户": {"user": ["*"]},
+}
+
+class ReplayPipeline:
+    """与在线监控相同的解析、汇总和写入流程"""
+    def __init__(self, db_path=None):
+        self.table = TrafficTable()
+        self.tracker = DeltaTracker(table=self.table)
+        self.first_poll = True
+        self.groups = GroupIndex(TRAFFIC_GROUPS)
+        self.detector = AnomalyDetector(self.table)
+        self.sink = SQLiteSink(db_path) if db_path else None
+
+        self.snapshots = 0
+        self.counters = 0
+        self.events = 0
+        self.sys_stats = None
+        self.started = time.perf_counter()
+
+    def __call__(self, ts, kind, payload):
+        if kind == SYS_STATS:
+            self.sys_stats = stats_pb2.SysStatsResponse.FromString(payload)
+            return
+        if kind != QUERY_STATS:
+            return
+
+        response = stats_pb2.QueryStatsResponse.FromString(payload)
+        self.table.update(response)
+        if self.first_poll:
+            # 与在线监控相同，首个快照只建立基线
+            self.tracker.prime(response)
+            self.first_poll = False
+        changes = self.tracker.update(response)
+        self.groups.update(changes)
+        self.events += len(self.detector.update(self.tracker.ids, self.tracker.deltas, ts))
+        if self.sink:
+            self.sink.write(changes, ts)
+
+        self.snapshots += 1
+        self.counters += len(response.stat)
+        if self.snapshots % REPORT_EVERY == 0:
+            elapsed = time.perf_counter() - self.started
+            print(f"已回放 {self.snapshots} 个快照, {self.snapshots / elapsed:.1f} 快照/秒")
+
+    def close(self):
+        if self.sink:
+            self.sink.close()
+
+def main():
+    print("=" * 70)
+    print("Sing-box 离线回放")
+    print("=" * 70)
+    print(f"录制文件: {RECORD_PATH}")
+    print(f"回放倍速: {SPEED if SPEED > 0 else '全速'}")
+    print(f"数据库: {DB_PATH or '不写入'}")
+    print("=" * 70)
+
+    pipeline = ReplayPipeline(DB_PATH)
+    try:
+        frames, elapsed = replay(read_frames(RECORD_PATH), pipeline, SPEED)
+    except KeyboardInterrupt:
+        print("\n回放已停止")
+        return
+    except (OSError, ValueError) as e:
+        print(f"[错误] 读取录制文件失败: {str(e)}")
+        return
+    finally:
+        pipeline.close()
+
+    snapshots = pipeline.snapshots
+    print("-" * 70)
+    print(f"帧数: {frames}")
+    print(f"快照数: {snapshots}")
+    print(f"平均计数器数: {pipeline.counters // snapshots if snapshots else 0}")
+    print(f"告警事件: {pipeline.events}")
+    print(f"耗时: {elapsed:.2f} 秒")
+    if elapsed > 0:
+        print(f"吞吐: {snapshots / elapsed:.1f} 快照/秒")
+    print("-" * 70)
+
+if __name__ == "__main__":
+    main()
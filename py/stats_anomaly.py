@@ -0,0 +1,148 @@
+import numpy as np
+
+# 默认参数
+ALPHA = 0.1              # EWMA 平滑系数
+Z_THRESHOLD = 4.0        # z-score 告警阈值
+MIN_SAMPLES = 12         # 预热轮数，之前不告警
+MIN_RATE = 1024.0        # 低于该速率（字节/秒）的计数器不参与告警
+FLATLINE_POLLS = 3       # 连续多少轮无流量视为断流
+INITIAL_CAPACITY = 1024  # 状态数组的初始容量
+
+class AnomalyDetector:
+    """按计数器流式维护速率的 EWMA 均值/方差，检测突增与断流
+
+    状态保存在 numpy 数组中，按 TrafficTable 分配的下标存放。每轮用
+    DeltaTracker 给出的下标和增量数组一次取出、更新、写回；没有增量的
+    轮次在计数器下次出现时按速率 0 用闭式解补算。断流检测按轮次分桶
+    记录活跃计数器，F 轮后检查同一桶中是否有计数器一直未再出现，因此
+    每轮开销只与变化的计数器数量成正比。
+    """
+    def __init__(self, table, alpha=ALPHA, z_threshold=Z_THRESHOLD, min_samples=MIN_SAMPLES,
+                 min_rate=MIN_RATE, flatline_polls=FLATLINE_POLLS):
+        self.table = table
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.min_rate = min_rate
+        self.flatline_polls = flatline_polls
+
+        # 下标 -> key，下标被复用时随之更新
+        self.keys = []
+        self.mean = np.zeros(INITIAL_CAPACITY)
+        self.var = np.zeros(INITIAL_CAPACITY)
+        self.samples = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self.last_poll = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        # 下标对应计数器的分配轮次，与表中不一致说明下标已分配给新的计数器
+        self.born = np.full(INITIAL_CAPACITY, -1, dtype=np.int64)
+
+        # 轮次 -> 该轮出现且满足断流检测条件的下标数组
+        self.due = {}
+        self.poll = 0
+        self.last_ts = None
+
+    def _grow(self, size):
+        """扩容状态数组，容量按倍数增长"""
+        capacity = len(self.mean)
+        while capacity < size:
+            capacity *= 2
+        for name in ("mean", "var", "samples", "last_poll", "born"):
+            old = getattr(self, name)
+            new = np.full(capacity, -1 if name == "born" else 0, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _claim(self, idx):
+        """重置首次出现或已被表复用给新计数器的下标"""
+        table = self.table
+        size = len(table.entries)
+        if size > len(self.mean):
+            self._grow(size)
+        born = np.frombuffer(table.born, dtype=np.int64)[idx]
+        fresh = np.flatnonzero(self.born[idx] != born)
+        if not len(fresh):
+            return
+
+        slots = idx[fresh]
+        self.born[slots] = born[fresh]
+        self.mean[slots] = 0.0
+        self.var[slots] = 0.0
+        self.samples[slots] = 0
+        self.last_poll[slots] = self.poll - 1
+        keys = self.keys
+        if len(keys) < size:
+            keys.extend([None] * (size - len(keys)))
+        entries = table.entries
+        for slot in slots.tolist():
+            keys[slot] = entries[slot].key
+
+    def update(self, ids, deltas, ts):
+        """处理一轮增量（DeltaTracker 的 ids、deltas），返回告警事件列表"""
+        events = []
+        self.poll += 1
+        poll = self.poll
+        dt = ts - self.last_ts if self.last_ts is not None else 0
+        self.last_ts = ts
+
+        if len(ids):
+            idx = np.array(ids, dtype=np.int64)
+            self._claim(idx)
+            if dt <= 0:
+                # 首轮或时间异常时无法计算速率，只记录出现时间并重新预热
+                self.last_poll[idx] = poll
+                self.samples[idx] = 0
+            else:
+                self._step(idx, np.array(deltas, dtype=np.float64) / dt, events)
+
+        self._flatlines(events)
+        return events
+
+    def _step(self, idx, rate, events):
+        """对一批计数器做一次 EWMA 更新并检测突增"""
+        poll = self.poll
+        alpha = self.alpha
+        keep = 1.0 - alpha
+        m = self.mean[idx]
+        v = self.var[idx]
+        n = self.samples[idx]
+
+        # 补算中间没有流量的轮次（速率为 0），连续 k 轮的闭式解:
+        #   m' = keep^k * m,  v' = keep^k * (v + (1 - keep^k) * m^2)
+        missed = poll - self.last_poll[idx] - 1
+        decay = np.power(keep, missed)
+        v = decay * (v + (1.0 - decay) * m * m)
+        m = decay * m
+        n = n + missed
+
+        # 突增检测
+        z = (rate - m) / np.sqrt(v + 1.0)
+        spikes = np.flatnonzero((n >= self.min_samples) & (rate >= self.min_rate) & (z >= self.z_threshold))
+        keys = self.keys
+        for i in spikes.tolist():
+            events.append({"type": "spike", "key": keys[idx[i]], "rate": float(rate[i]),
+                           "mean": float(m[i]), "z": float(z[i])})
+
+        # 更新 EWMA 均值和方差
+        diff = rate - m
+        m += alpha * diff
+        v = keep * (v + alpha * diff * diff)
+        n += 1
+        self.mean[idx] = m
+        self.var[idx] = v
+        self.samples[idx] = n
+        self.last_poll[idx] = poll
+
+        # 之后 F 轮都未再出现的活跃计数器视为断流
+        self.due[poll] = idx[(m >= self.min_rate) & (n >= self.min_samples)]
+
+    def _flatlines(self, events):
+        """检查 F 轮前活跃的计数器是否一直没有再出现"""
+        expected = self.poll - self.flatline_polls
+        due = self.due.pop(expected, None)
+        if due is None or not len(due):
+            return
+        stale = due[self.last_poll[due] == expected]
+        mean = self.mean
+        keys = self.keys
+        for slot in stale.tolist():
+            events.append({"type": "flatline", "key": keys[slot], "rate": 0.0,
+                           "mean": float(mean[slot]), "z": None})
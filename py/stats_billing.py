@@ -0,0 +1,273 @@
+import calendar
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from stats_sink import DAY, HOUR, UTC_OFFSET, day_bucket, hour_bucket
+
+class FenwickTree:
+    """可追加的树状数组（Fenwick），支持 O(log n) 前缀和与单点更新"""
+    def __init__(self):
+        # 下标从 1 开始，tree[0] 不使用
+        self.tree = array("q", [0])
+
+    def __len__(self):
+        return len(self.tree) - 1
+
+    def add(self, i, delta):
+        """第 i 个元素（从 0 开始）加上 delta"""
+        tree = self.tree
+        n = len(tree)
+        i += 1
+        while i < n:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """前 i 个元素之和"""
+        tree = self.tree
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    @classmethod
+    def build(cls, values):
+        """由完整的元素序列线性时间建树"""
+        self = cls()
+        tree = self.tree = array("q", [0])
+        tree.extend(values)
+        n = len(tree)
+        for i in range(1, n):
+            j = i + (i & -i)
+            if j < n:
+                tree[j] += tree[i]
+        return self
+
+    def append(self, value):
+        """在末尾追加一个元素，O(log n)"""
+        i = len(self.tree)
+        # 新节点覆盖区间 (i - lowbit(i), i]，其中前面部分已在树中
+        lowbit = i & -i
+        self.tree.append(self.prefix(i - 1) - self.prefix(i - lowbit) + value)
+
+class BucketSeries:
+    """单个计数器按时间桶存储的流量序列（只保存有流量的桶）"""
+    def __init__(self):
+        self.buckets = array("q")
+        self.tree = FenwickTree()
+
+    def add(self, bucket, value):
+        buckets = self.buckets
+        if not buckets or bucket > buckets[-1]:
+            buckets.append(bucket)
+            self.tree.append(value)
+            return
+
+        i = bisect_left(buckets, bucket)
+        if buckets[i] == bucket:
+            self.tree.add(i, value)
+            return
+
+        # 极少出现的乱序写入：插入后重建
+        values = self.values()
+        buckets.insert(i, bucket)
+        values.insert(i, value)
+        self.tree = FenwickTree.build(values)
+
+    def values(self):
+        tree = self.tree
+        return [tree.prefix(j + 1) - tree.prefix(j) for j in range(len(self.buckets))]
+
+    def extend(self, buckets, values):
+        """批量加入按时间排序的桶，与已有数据合并后一次性建树"""
+        if self.buckets and buckets[0] <= self.buckets[-1]:
+            merged = dict(zip(self.buckets, self.values()))
+            for bucket, value in zip(buckets, values):
+                merged[bucket] = merged.get(bucket, 0) + value
+            buckets = sorted(merged)
+            values = [merged[bucket] for bucket in buckets]
+        elif self.buckets:
+            buckets = list(self.buckets) + list(buckets)
+            values = self.values() + list(values)
+        self.buckets = array("q", buckets)
+        self.tree = FenwickTree.build(values)
+
+    def range_sum(self, start, end):
+        """时间桶位于 [start, end) 内的流量之和"""
+        lo = bisect_left(self.buckets, start)
+        hi = bisect_left(self.buckets, end)
+        if hi <= lo:
+            return 0
+        return self.tree.prefix(hi) - self.tree.prefix(lo)
+
+class BillingStore:
+    """按用户统计任意时间段流量，用于账期结算
+
+    整天的部分使用天汇总，不足一天的首尾部分使用小时汇总（小时精度），
+    load 只加载给定时间段需要的数据，查询也只能覆盖已加载的时间段。
+    """
+    def __init__(self, utc_offset=UTC_OFFSET):
+        self.utc_offset = utc_offset
+        # (user, direction) -> BucketSeries
+        self.hourly = {}
+        self.daily = {}
+        # user -> [direction, ...]
+        self.users = {}
+        # 汇总表 -> 已加载的时间段 [(start, end), ...]，避免重复加载
+        self.loaded = {"rollup_hourly": [], "rollup_daily": []}
+
+    def _series(self, table, user, direction):
+        key = (user, direction)
+        series = table.get(key)
+        if series is None:
+            series = table[key] = BucketSeries()
+            directions = self.users.setdefault(user, [])
+            if direction not in directions:
+                directions.append(direction)
+        return series
+
+    def _next_day(self, ts):
+        """不早于 ts 的第一个本地零点"""
+        day = day_bucket(ts, self.utc_offset)
+        if day == ts:
+            return day
+        # 加 26 小时可跨过 23/25 小时的夏令时切换日
+        return day_bucket(day + DAY + 2 * HOUR, self.utc_offset)
+
+    def _split(self, start, end):
+        """把 [start, end) 拆成 (小时段, 小时段, 整天段)"""
+        first_day = self._next_day(start)
+        last_day = day_bucket(end, self.utc_offset)
+        if first_day >= last_day:
+            return (start, end), (end, end), (end, end)
+        return (start, first_day), (last_day, end), (first_day, last_day)
+
+    def _load_rows(self, conn, table, series, start, end):
+        users = {
+            counter_id: (tag, direction)
+            for counter_id, tag, direction in conn.execute(
+                "SELECT id, tag, direction FROM counters WHERE resource = 'user'"
+            )
+        }
+        # 不在 SQL 中排序（数据量大时临时 B 树排序很慢），按计数器分组后再排序
+        rows = {}
+        for counter_id, bucket, value in conn.execute(
+            f"SELECT counter_id, bucket, value FROM {table} WHERE bucket >= ? AND bucket < ?",
+            (start, end),
+        ):
+            row = rows.get(counter_id)
+            if row is None:
+                if counter_id not in users:
+                    continue
+                row = rows[counter_id] = []
+            row.append((bucket, value))
+
+        for counter_id, row in rows.items():
+            row.sort()
+            self._series(series, *users[counter_id]).extend(
+                [bucket for bucket, _ in row], [value for _, value in row]
+            )
+
+    def _load_range(self, conn, table, series, start, end):
+        """只加载 [start, end) 中尚未加载的部分"""
+        if start >= end:
+            return
+        loaded = self.loaded[table]
+        pos = start
+        for lo, hi in sorted(loaded):
+            if hi <= pos:
+                continue
+            if lo >= end:
+                break
+            if lo > pos:
+                self._load_rows(conn, table, series, pos, lo)
+            pos = max(pos, hi)
+        if pos < end:
+            self._load_rows(conn, table, series, pos, end)
+        loaded.append((start, end))
+
+    def load(self, conn, start, end):
+        """从 SQLite 加载 [start, end) 内的用户流量：整天读天汇总，首尾读小时汇总"""
+        start = hour_bucket(int(start), self.utc_offset)
+        end = hour_bucket(int(end), self.utc_offset)
+        head, tail, days = self._split(start, end)
+        self._load_range(conn, "rollup_hourly", self.hourly, *head)
+        self._load_range(conn, "rollup_hourly", self.hourly, *tail)
+        self._load_range(conn, "rollup_daily", self.daily, *days)
+        return self
+
+    def update(self, changes, ts=None):
+        """累加一次轮询的增量 [(key, delta, value), ...]"""
+        ts = int(ts if ts is not None else time.time())
+        hour = hour_bucket(ts, self.utc_offset)
+        day = day_bucket(ts, self.utc_offset)
+        for (resource, tag, direction), delta, _ in changes:
+            if resource == "user":
+                self._series(self.hourly, tag, direction).add(hour, delta)
+                self._series(self.daily, tag, direction).add(day, delta)
+
+    def usage(self, user, start, end):
+        """用户在 [start, end) 内的流量，边界按小时对齐"""
+        result = {"uplink": 0, "downlink": 0}
+        start = hour_bucket(int(start), self.utc_offset)
+        end = hour_bucket(int(end), self.utc_offset)
+        head, tail, days = self._split(start, end)
+        for direction in self.users.get(user, ()):
+            key = (user, direction)
+            hourly = self.hourly.get(key)
+            if hourly is not None:
+                result[direction] += hourly.range_sum(*head) + hourly.range_sum(*tail)
+            daily = self.daily.get(key)
+            if daily is not None:
+                result[direction] += daily.range_sum(*days)
+        return result
+
+    def _month_start(self, year, month):
+        if self.utc_offset is None:
+            return int(time.mktime((year, month, 1, 0, 0, 0, 0, 0, -1)))
+        return calendar.timegm((year, month, 1, 0, 0, 0)) - self.utc_offset
+
+    def month_range(self, year, month):
+        """本地时间自然月的起止时间戳"""
+        start = self._month_start(year, month)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return start, self._month_start(year, month)
+
+    def month_usage(self, user, year, month):
+        """用户在自然月内的流量"""
+        return self.usage(user, *self.month_range(year, month))
+
+    def rolling_range(self, days=30, now=None):
+        """最近 days 个本地自然日（含今天，截至当前小时）的起止时间戳"""
+        now = int(now if now is not None else time.time())
+        end = hour_bucket(now, self.utc_offset) + HOUR
+        if self.utc_offset is None:
+            t = time.localtime(now)
+            start = int(time.mktime((t.tm_year, t.tm_mon, t.tm_mday - days + 1, 0, 0, 0, 0, 0, -1)))
+        else:
+            start = day_bucket(now, self.utc_offset) - (days - 1) * DAY
+        return start, end
+
+    def rolling_usage(self, user, days=30, now=None):
+        """用户最近 days 天的流量"""
+        return self.usage(user, *self.rolling_range(days, now))
+
+    def invoice(self, year=None, month=None):
+        """自然月内有流量的用户及其流量，默认为当月
+
+        users 中还包含只为其他时间段（如滚动窗口）加载的用户，账期内
+        没有流量的用户不列入账单。
+        """
+        if year is None or month is None:
+            today = datetime.now()
+            year, month = today.year, today.month
+        start, end = self.month_range(year, month)
+        result = {}
+        for user in self.users:
+            usage = self.usage(user, start, end)
+            if usage["uplink"] or usage["downlink"]:
+                result[user] = usage
+        return result
@@ -0,0 +1,175 @@
+import re
+import threading
+from concurrent.futures import Future
+
+import stats_pb2
+
+# 合并窗口（秒），窗口内的并发请求合并为一次 QueryStats
+COALESCE_WINDOW = 0.02
+# 两种引擎语义不同的语法: 环视、反向引用、原子分组、条件分组、\Z（RE2 不支持），
+# POSIX 字符类 [[:alpha:]]（Python re 不支持）
+UNSUPPORTED_REGEX = re.compile(r"\(\?(?:=|!|<=|<!|P=|>|\()|\\(?:[1-9]|Z)|(?<!\\)\[:")
+
+def _compile(pattern):
+    """按 RE2 与 Python re 共同支持的语法编译正则，不支持时抛出 re.error
+
+    RE2 的数字、单词、空白字符类和单词边界只按 ASCII 判断，这里用
+    re.ASCII 保持一致。
+    """
+    # 先去掉转义的反斜杠，避免把 \\1 误判为反向引用
+    if UNSUPPORTED_REGEX.search(pattern.replace("\\\\", "")):
+        raise re.error(f"正则 '{pattern}' 使用了 RE2 与 Python re 语义不同的语法（环视、反向引用等）")
+    return re.compile(pattern, re.ASCII)
+
+def _match_any(name, patterns, regexp):
+    """与 QueryStatsRequest 相同的匹配语义：空列表匹配全部，否则子串或正则搜索
+
+    regexp=True 时 patterns 为 _compile 编译后的正则。
+    """
+    if not patterns:
+        return True
+    if regexp:
+        return any(pattern.search(name) for pattern in patterns)
+    return any(pattern in name for pattern in patterns)
+
+class CoalescingStatsClient:
+    """合并并发的统计查询，降低对 sing-box API 的请求量
+
+    窗口内的 get_stats（按完整名称）和 query_stats 请求合并为最多两次
+    QueryStats（子串模式一次、正则模式一次），结果按各自的条件分发回
+    调用方；相同的请求在结果返回前只会发出一次（single-flight）。
+    reset=True 的请求会修改计数器，不参与合并。
+
+    正则由 sing-box 按 Go RE2 执行，合并结果在本地用 Python re 分发，
+    因此只接受两者语义一致的子集：不支持环视、反向引用、原子分组、
+    条件分组和 POSIX 字符类，字符类按 ASCII 匹配。合并的正则查询失败时逐个请求重新
+    查询，只有出错的请求失败，单独查询的结果直接取服务端的匹配。
+    """
+    def __init__(self, stub, window=COALESCE_WINDOW):
+        self.stub = stub
+        self.window = window
+        self.lock = threading.Lock()
+        # 请求键 -> Future，等待当前窗口结束
+        self.pending = {}
+        # 请求键 -> Future，已发出尚未返回
+        self.inflight = {}
+        self.timer = None
+        # 计数，便于观察合并效果
+        self.requests = 0
+        self.upstream_calls = 0
+
+    def get_stats(self, name, timeout=None):
+        """按完整名称获取单个统计项，不存在时返回 None"""
+        return self._submit(("get", name, False)).result(timeout)
+
+    def query_stats(self, patterns=(), regexp=False, reset=False, timeout=None):
+        """与 QueryStats 相同的查询，返回 Stat 列表"""
+        if reset:
+            with self.lock:
+                self.requests += 1
+                self.upstream_calls += 1
+            request = stats_pb2.QueryStatsRequest(patterns=list(patterns), regexp=regexp, reset=True)
+            return list(self.stub.QueryStats(request).stat)
+        key = ("query", tuple(sorted(set(patterns))), bool(regexp))
+        return self._submit(key).result(timeout)
+
+    def _submit(self, key):
+        with self.lock:
+            self.requests += 1
+            future = self.inflight.get(key) or self.pending.get(key)
+            if future is None:
+                future = self.pending[key] = Future()
+                if self.timer is None:
+                    self.timer = threading.Timer(self.window, self._flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+        return future
+
+    def _query(self, patterns, regexp):
+        with self.lock:
+            self.upstream_calls += 1
+        request = stats_pb2.QueryStatsRequest(patterns=sorted(patterns), regexp=regexp)
+        return list(self.stub.QueryStats(request).stat)
+
+    def _flush(self):
+        with self.lock:
+            batch = self.pending
+            self.pending = {}
+            self.timer = None
+            self.inflight.update(batch)
+
+        try:
+            plain = {}
+            regex = {}
+            for key, future in batch.items():
+                if not key[2]:
+                    plain[key] = future
+                    continue
+                # 无效的正则只让对应的请求失败，不影响同一窗口内的其他请求
+                try:
+                    for pattern in key[1]:
+                        _compile(pattern)
+                except re.error as e:
+                    future.set_exception(e)
+                    continue
+                regex[key] = future
+
+            if plain:
+                try:
+                    patterns = set()
+                    # 任一请求查询全部时只需一次不带条件的查询
+                    if not any(kind == "query" and not value for kind, value, _ in plain):
+                        for kind, value, _ in plain:
+                            if kind == "get":
+                                patterns.add(value)
+                            else:
+                                patterns.update(value)
+                    self._dispatch(plain, self._query(patterns, False))
+                except Exception as e:
+                    self._fail(plain, e)
+
+            if len(regex) > 1:
+                try:
+                    patterns = set()
+                    if all(value for _, value, _ in regex):
+                        for _, value, _ in regex:
+                            patterns.update(value)
+                    self._dispatch(regex, self._query(patterns, True))
+                except Exception:
+                    # 服务端可能拒绝本地校验通过的正则，逐个重试找出出错的请求
+                    self._query_each(regex)
+            elif regex:
+                self._query_each(regex)
+
+        finally:
+            with self.lock:
+                for key, future in batch.items():
+                    if self.inflight.get(key) is future:
+                        del self.inflight[key]
+
+    def _query_each(self, batch):
+        """逐个请求单独查询，结果即服务端的匹配，不再在本地过滤"""
+        for key, future in batch.items():
+            if future.done():
+                continue
+            try:
+                future.set_result(self._query(key[1], key[2]))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _fail(self, batch, error):
+        for future in batch.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def _dispatch(self, batch, stats):
+        """按各请求的条件从合并结果中取出对应部分"""
+        by_name = None
+        for (kind, value, regexp), future in batch.items():
+            if kind == "get":
+                if by_name is None:
+                    by_name = {stat.name: stat for stat in stats}
+                future.set_result(by_name.get(value))
+            else:
+                patterns = [_compile(pattern) for pattern in value] if regexp else value
+                future.set_result([stat for stat in stats if _match_any(stat.name, patterns, regexp)])
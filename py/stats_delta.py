@@ -0,0 +1,92 @@
+from array import array
+
+from stats_records import TrafficTable
+
+def _no_records(resource, tag):
+    """内部表只缓存名称解析结果，不建立流量记录"""
+    return False
+
+class DeltaTracker:
+    """根据累计计数器计算每次轮询的增量
+
+    上一次的累计值保存在 TrafficTable 名称解析缓存的 StatEntry.last 中，
+    每轮只做字典查找和属性赋值，不为每个计数器创建键或字典。传入 table
+    时与该表共用缓存，调用方需在同一轮先执行 table.update(response)；
+    否则使用只做名称解析的内部表。
+
+    update 之后 ids、deltas 按相同顺序保存有变化的计数器在表内的下标
+    和增量，供按下标做批量计算的模块直接使用。
+    """
+    def __init__(self, reset_counters=False, last_values=None, table=None):
+        # reset_counters 为 True 时服务端每次返回的就是增量
+        self.reset_counters = reset_counters
+        # 从数据库恢复的累计值 (resource, tag, direction) -> value，计数器首次出现时取用
+        self.restored = dict(last_values or {})
+        self.shared = table is not None
+        self.table = table if self.shared else TrafficTable(_no_records)
+        self.ids = array("q")
+        self.deltas = array("q")
+
+    def prime(self, response):
+        """为还没有基线的计数器记录当前累计值，不产生增量"""
+        table = self.table
+        parsed = table.parsed
+        restored = self.restored
+        for stat in response.stat:
+            entry = parsed.get(stat.name, False)
+            if entry is False:
+                entry = table.entry(stat.name)
+            if entry is not None and entry.last is None and entry.key not in restored:
+                entry.last = stat.value
+
+    def update(self, response):
+        """返回 [(key, delta, value), ...]，只包含本次有变化的计数器"""
+        table = self.table
+        if not self.shared:
+            table.begin()
+        generation = table.generation
+        parsed = table.parsed
+        restored = self.restored
+        reset_counters = self.reset_counters
+        changes = []
+        ids = array("q")
+        deltas = array("q")
+
+        for stat in response.stat:
+            entry = parsed.get(stat.name, False)
+            if entry is False:
+                entry = table.entry(stat.name)
+            if entry is None:
+                continue
+
+            entry.generation = generation
+            value = stat.value
+            last = entry.last
+            entry.last = value
+            if reset_counters:
+                delta = value
+            else:
+                if last is None:
+                    last = restored.pop(entry.key, 0) if restored else 0
+                # sing-box 重启后计数器归零，此时整个值都是新增流量
+                delta = value - last if value >= last else value
+
+            if delta > 0:
+                changes.append((entry.key, delta, value))
+                ids.append(entry.index)
+                deltas.append(delta)
+
+        # 长时间消失的计数器随缓存一起清理，再次出现时从 0 开始计算
+        if not self.shared:
+            table.prune(len(response.stat))
+        self.ids = ids
+        self.deltas = deltas
+        return changes
+
+    def rollback(self):
+        """撤销上一次 update 对累计值的修改，下次轮询重新计算这部分增量"""
+        entries = self.table.entries
+        for index, delta in zip(self.ids, self.deltas):
+            entries[index].last -= delta
+        self.ids = array("q")
+        self.deltas = array("q")
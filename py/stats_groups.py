@@ -0,0 +1,112 @@
+from fnmatch import fnmatchcase
+
+from stats_records import TrafficRecord
+
+# 可分组的资源类型
+RESOURCES = ("inbound", "outbound", "user")
+# 计数器连续这么多轮没有增量后从映射中移除（实际保留 N 到 2N 轮）
+EVICT_POLLS = 360
+
+def _is_glob(pattern):
+    return any(c in pattern for c in "*?[")
+
+class GroupIndex:
+    """标签分组索引，按每次轮询的增量维护分组总流量
+
+    分组配置示例:
+        {
+            "代理": {"outbound": ["🌐代理", "HK-*"]},
+            "直连": {"outbound": ["➡️直连", "CN"]},
+            "客户A": {"user": ["*@corp-a.com"]},
+            "全部出站": {"groups": ["代理", "直连"]},
+        }
+    """
+    def __init__(self, groups):
+        # (resource, tag) -> 直接包含该标签的分组（精确匹配）
+        self.exact = {}
+        # resource -> [(通配符, 分组), ...]
+        self.globs = {resource: [] for resource in RESOURCES}
+        # 分组 -> 包含它的所有上级分组（含自身）
+        self.ancestors = self._compile(groups)
+        # (resource, tag, direction) -> 所属分组，首次出现时计算
+        # 分两代保存，每 EVICT_POLLS 轮轮换一次，上一代中未再用到的计数器随之丢弃
+        self.mapping = {}
+        self.previous = {}
+        self.polls = 0
+        self.totals = {name: TrafficRecord("group", name) for name in groups}
+
+    def _compile(self, groups):
+        """编译分组配置，展开嵌套分组"""
+        parents = {name: [] for name in groups}
+        for name, members in groups.items():
+            for key, patterns in members.items():
+                if key == "groups":
+                    for child in patterns:
+                        if child not in groups:
+                            raise ValueError(f"分组 '{name}' 引用了未定义的分组 '{child}'")
+                        parents[child].append(name)
+                elif key in RESOURCES:
+                    for pattern in patterns:
+                        if _is_glob(pattern):
+                            self.globs[key].append((pattern, name))
+                        else:
+                            self.exact.setdefault((key, pattern), []).append(name)
+                else:
+                    raise ValueError(f"分组 '{name}' 包含未知的成员类型 '{key}'")
+
+        ancestors = {}
+
+        def resolve(name, path):
+            if name in path:
+                raise ValueError(f"分组存在循环引用: {' -> '.join(path + (name,))}")
+            if name not in ancestors:
+                result = {name}
+                for parent in parents[name]:
+                    result |= resolve(parent, path + (name,))
+                ancestors[name] = frozenset(result)
+            return ancestors[name]
+
+        for name in groups:
+            resolve(name, ())
+        return ancestors
+
+    def groups_for(self, key):
+        """返回计数器所属的全部分组记录（含嵌套分组）"""
+        result = self.mapping.get(key)
+        if result is None:
+            result = self.previous.get(key)
+            if result is not None:
+                self.mapping[key] = result
+                return result
+            resource, tag, _ = key
+            direct = list(self.exact.get((resource, tag), ()))
+            for pattern, name in self.globs.get(resource, ()):
+                if fnmatchcase(tag, pattern):
+                    direct.append(name)
+
+            # 同一计数器经多条路径进入同一分组时只计一次
+            groups = set()
+            for name in direct:
+                groups |= self.ancestors[name]
+            result = tuple(self.totals[name] for name in groups)
+            self.mapping[key] = result
+        return result
+
+    def expire(self):
+        """轮换映射，丢弃一整代都没有用到的计数器"""
+        self.previous = self.mapping
+        self.mapping = {}
+
+    def update(self, changes):
+        """累加一次轮询的增量 [(key, delta, value), ...]"""
+        self.polls += 1
+        if self.polls % EVICT_POLLS == 0:
+            self.expire()
+        for key, delta, _ in changes:
+            if key[2] == "uplink":
+                for record in self.groups_for(key):
+                    record.uplink += delta
+            else:
+                for record in self.groups_for(key):
+                    record.downlink += delta
+        return self.totals
@@ -0,0 +1,166 @@
+import re
+from bisect import bisect_left, insort
+from fnmatch import fnmatchcase
+
+# 通配符中的特殊字符
+GLOB_CHARS = "*?["
+# 正则中会中断字面前缀的特殊字符
+REGEX_CHARS = ".^$*+?{}[]\\|()"
+# 用作前缀区间上界的最大字符
+MAX_CHAR = "\U0010ffff"
+# 增删的名称超过索引大小的该比例时整体重建，而不是逐个插入
+REBUILD_RATIO = 0.05
+
+def _literal_prefix(pattern, special):
+    """返回模式开头不含特殊字符的部分"""
+    for i, c in enumerate(pattern):
+        if c in special:
+            return pattern[:i]
+    return pattern
+
+def _regex_prefix(pattern):
+    """返回以 ^ 锚定的正则开头的字面前缀，无法确定时返回空串"""
+    # 含有分支时前缀不一定是必需的
+    if not pattern.startswith("^") or "|" in pattern:
+        return ""
+    prefix = _literal_prefix(pattern[1:], REGEX_CHARS)
+    # 量词作用于前一个字符，如 ^ab* 中的 b 不是必需的
+    rest = pattern[1 + len(prefix):]
+    if prefix and rest[:1] in ("*", "?", "{"):
+        prefix = prefix[:-1]
+    return prefix
+
+def _regex_suffix(pattern):
+    """返回以 $ 锚定的正则结尾的字面后缀，无法确定时返回空串"""
+    # 含有分支或内联标志（如 (?i)）时后缀不一定是必需的字面量
+    if "|" in pattern or "(?" in pattern:
+        return ""
+    # 逐个解析: 普通字符和转义的标点是字面量，其余记为 None
+    tokens = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            escaped = pattern[i + 1:i + 2]
+            tokens.append(escaped if escaped and not escaped.isalnum() else None)
+            i += 2
+            continue
+        tokens.append(None if c in REGEX_CHARS else c)
+        i += 1
+    # 结尾的 $ 必须是锚点而不是转义的字面量
+    if not pattern.endswith("$") or tokens[-1] is not None:
+        return ""
+    suffix = []
+    for token in reversed(tokens[:-1]):
+        if token is None:
+            break
+        suffix.append(token)
+    return "".join(reversed(suffix))
+
+class StatIndex:
+    """统计项名称的前缀索引，在本地快照上执行通配符/前缀/正则查询
+
+    名称按正序和逆序各保存一份有序数组，前缀和后缀都可以用二分查找
+    缩小候选范围，再对候选项逐个匹配。查询语义与 QueryStatsRequest 一致:
+    patterns 为空返回全部，regexp=False 时为子串匹配，regexp=True 时为
+    正则搜索（不要求整体匹配）。
+    """
+    def __init__(self):
+        self.values = {}
+        self.names = []
+        self.reversed_names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, value):
+        if name not in self.values:
+            insort(self.names, name)
+            insort(self.reversed_names, name[::-1])
+        self.values[name] = value
+
+    def remove(self, name):
+        if self.values.pop(name, None) is None:
+            return
+        del self.names[bisect_left(self.names, name)]
+        reversed_name = name[::-1]
+        del self.reversed_names[bisect_left(self.reversed_names, reversed_name)]
+
+    def update(self, response):
+        """用最新的 QueryStatsResponse 更新快照，只增删有变化的名称"""
+        current = {stat.name: stat.value for stat in response.stat}
+        removed = [name for name in self.values if name not in current]
+        added = [name for name in current if name not in self.values]
+
+        if len(removed) + len(added) > REBUILD_RATIO * len(self.names):
+            # 大量变化（如首次加载）时一次排序重建，避免逐个插入的 O(n²)
+            self.values = current
+            self.names = sorted(current)
+            self.reversed_names = sorted(name[::-1] for name in current)
+            return
+
+        for name in removed:
+            self.remove(name)
+        for name in added:
+            insort(self.names, name)
+            insort(self.reversed_names, name[::-1])
+        self.values = current
+
+    def _range(self, names, prefix):
+        lo = bisect_left(names, prefix)
+        hi = bisect_left(names, prefix + MAX_CHAR, lo)
+        return lo, hi
+
+    def prefix(self, prefix):
+        """返回以 prefix 开头的统计项 {name: value}"""
+        lo, hi = self._range(self.names, prefix)
+        return {name: self.values[name] for name in self.names[lo:hi]}
+
+    def _candidates(self, prefix, suffix=""):
+        """按字面前缀/后缀二分查找，返回数量较少的一组候选名称"""
+        lo, hi = self._range(self.names, prefix)
+        if suffix:
+            rlo, rhi = self._range(self.reversed_names, suffix[::-1])
+            if rhi - rlo < hi - lo:
+                return [name[::-1] for name in self.reversed_names[rlo:rhi]]
+        return self.names[lo:hi]
+
+    def glob(self, pattern):
+        """返回匹配通配符的统计项，如 user>>>*@corp.com>>>traffic>>>*"""
+        prefix = _literal_prefix(pattern, GLOB_CHARS)
+        suffix = _literal_prefix(pattern[::-1], GLOB_CHARS + "]")[::-1]
+        if prefix == pattern:
+            return {pattern: self.values[pattern]} if pattern in self.values else {}
+        return {
+            name: self.values[name]
+            for name in self._candidates(prefix, suffix)
+            if fnmatchcase(name, pattern)
+        }
+
+    def regexp(self, pattern):
+        """返回匹配正则的统计项
+
+        以 ^ 开头的正则按字面前缀、以 $ 结尾的正则按字面后缀缩小范围，
+        两端都没有锚定的正则需要逐个匹配全部名称。
+        """
+        matcher = re.compile(pattern)
+        return {
+            name: self.values[name]
+            for name in self._candidates(_regex_prefix(pattern), _regex_suffix(pattern))
+            if matcher.search(name)
+        }
+
+    def query(self, patterns=(), regexp=False):
+        """与 QueryStatsRequest(patterns=..., regexp=...) 语义相同的本地查询"""
+        if not patterns:
+            return dict(self.values)
+        if regexp:
+            result = {}
+            for pattern in patterns:
+                result.update(self.regexp(pattern))
+            return result
+        return {
+            name: value
+            for name, value in self.values.items()
+            if any(pattern in name for pattern in patterns)
+        }
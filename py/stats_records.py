@@ -0,0 +1,169 @@
+import re
+from array import array
+
+# 流量统计正则表达式
+TRAFFIC_REGEX = re.compile(r"(inbound|outbound|user)>>>([^>]+)>>>traffic>>>(downlink|uplink)")
+
+# 可解析的资源类型
+RESOURCES = ("inbound", "outbound", "user")
+
+# 解析缓存中表示“尚未解析”的占位
+_MISSING = object()
+
+class TrafficRecord:
+    """单个标签的上下行流量，轮询间复用并原地更新"""
+    __slots__ = ("resource", "tag", "uplink", "downlink", "generation")
+
+    def __init__(self, resource, tag):
+        self.resource = resource
+        self.tag = tag
+        self.uplink = 0
+        self.downlink = 0
+        self.generation = 0
+
+    @property
+    def total(self):
+        return self.uplink + self.downlink
+
+class StatEntry:
+    """单个统计项名称的解析结果，缓存后每次轮询复用"""
+    __slots__ = ("key", "record", "uplink", "last", "generation", "index")
+
+    def __init__(self, key, record, index):
+        # (resource, tag, direction)，作为增量的键在轮询间复用
+        self.key = key
+        # 表内的稠密下标，供按下标在数组中保存状态的模块使用
+        self.index = index
+        # 不需要统计的标签为 None
+        self.record = record
+        self.uplink = key[2] == "uplink"
+        # 上一次的累计值，由 DeltaTracker 维护，None 表示还没有基线
+        self.last = None
+        self.generation = 0
+
+class TrafficTable:
+    """按统计项名称缓存解析结果，每次轮询只做字典查找和属性赋值
+
+    accept(resource, tag) 用于过滤需要统计的标签，每个名称只调用一次。
+    """
+    def __init__(self, accept=None):
+        self.accept = accept
+        # resource -> {tag: TrafficRecord}
+        self.records = {resource: {} for resource in RESOURCES}
+        # 统计项名称 -> StatEntry，不是流量统计项的名称为 None
+        self.parsed = {}
+        # 下标 -> StatEntry，清理后空出的下标留给新的名称复用
+        self.entries = []
+        self.free = []
+        # 下标 -> 分配时的轮次，下标被复用时随之变化
+        self.born = array("q")
+        self.generation = 0
+
+    def entry(self, name):
+        """返回统计项名称的解析结果，首次出现时解析并缓存"""
+        entry = self.parsed.get(name, _MISSING)
+        if entry is _MISSING:
+            entry = None
+            match = TRAFFIC_REGEX.match(name)
+            if match:
+                key = match.groups()
+                resource, tag, _ = key
+                record = None
+                if self.accept is None or self.accept(resource, tag):
+                    records = self.records[resource]
+                    record = records.get(tag)
+                    if record is None:
+                        record = records[tag] = TrafficRecord(resource, tag)
+                entry = self._allocate(key, record)
+            self.parsed[name] = entry
+        return entry
+
+    def _allocate(self, key, record):
+        if self.free:
+            index = self.free.pop()
+            entry = self.entries[index] = StatEntry(key, record, index)
+            self.born[index] = self.generation
+        else:
+            entry = StatEntry(key, record, len(self.entries))
+            self.entries.append(entry)
+            self.born.append(self.generation)
+        return entry
+
+    def update(self, response):
+        """用一次 QueryStatsResponse 原地更新所有记录"""
+        self.generation += 1
+        generation = self.generation
+        parsed = self.parsed
+        seen = 0
+
+        for stat in response.stat:
+            entry = parsed.get(stat.name, _MISSING)
+            if entry is _MISSING:
+                entry = self.entry(stat.name)
+            if entry is None:
+                continue
+
+            entry.generation = generation
+            record = entry.record
+            if record is None:
+                continue
+            if record.generation != generation:
+                record.generation = generation
+                record.uplink = 0
+                record.downlink = 0
+                seen += 1
+            if entry.uplink:
+                record.uplink = stat.value
+            else:
+                record.downlink = stat.value
+
+        self.prune(len(response.stat))
+        return seen
+
+    def begin(self):
+        """开始新一轮外部写入（如分片解析结果），之后用 record 取得记录原地更新"""
+        self.generation += 1
+
+    def record(self, resource, tag):
+        """返回标签的记录，不存在时新建"""
+        records = self.records[resource]
+        record = records.get(tag)
+        if record is None:
+            record = records[tag] = TrafficRecord(resource, tag)
+        return record
+
+    def prune(self, active):
+        """大量计数器消失后清理过期记录和缓存，避免长期运行时无限增长
+
+        返回是否执行了清理。
+        """
+        size = max(len(self.parsed), sum(len(records) for records in self.records.values()))
+        if size > 2 * active + 1024:
+            self._prune()
+            return True
+        return False
+
+    def _prune(self):
+        generation = self.generation
+        for resource, records in self.records.items():
+            self.records[resource] = {
+                tag: record for tag, record in records.items() if record.generation == generation
+            }
+        parsed = {}
+        for name, entry in self.parsed.items():
+            if entry is None:
+                continue
+            if entry.generation == generation:
+                parsed[name] = entry
+            else:
+                self.entries[entry.index] = None
+                self.free.append(entry.index)
+        self.parsed = parsed
+
+    def current(self, resource):
+        """返回本次轮询中有流量的记录"""
+        generation = self.generation
+        return [
+            record for record in self.records[resource].values()
+            if record.generation == generation and (record.uplink > 0 or record.downlink > 0)
+        ]
@@ -0,0 +1,90 @@
+import os
+import struct
+import time
+
+# 帧类型
+QUERY_STATS = 1
+SYS_STATS = 2
+
+# 帧头: 时间戳(double) + 类型(uint8) + 长度(uint32)，小端
+FRAME_HEADER = struct.Struct("<dBI")
+FILE_MAGIC = b"SBSTATS1"
+
+class Recorder:
+    """将原始响应字节按帧追加写入录制文件"""
+    def __init__(self, path):
+        # 上次录制中途退出时末尾可能留下不完整的帧，先截掉再追加
+        end = _complete_length(path) if os.path.exists(path) else 0
+        self.file = open(path, "r+b" if os.path.exists(path) else "wb")
+        self.file.truncate(end)
+        self.file.seek(end)
+        if end == 0:
+            self.file.write(FILE_MAGIC)
+        self.frames = 0
+
+    def write(self, kind, payload, ts=None):
+        ts = ts if ts is not None else time.time()
+        self.file.write(FRAME_HEADER.pack(ts, kind, len(payload)))
+        self.file.write(payload)
+        self.frames += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def _complete_length(path):
+    """返回录制文件中最后一个完整帧的结束位置，空文件或只有部分文件头时为 0"""
+    with open(path, "rb") as f:
+        magic = f.read(len(FILE_MAGIC))
+        if len(magic) < len(FILE_MAGIC) and FILE_MAGIC.startswith(magic):
+            return 0
+        if magic != FILE_MAGIC:
+            raise ValueError(f"不是有效的录制文件: {path}")
+        size = os.fstat(f.fileno()).st_size
+        end = f.tell()
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return end
+            _, _, length = FRAME_HEADER.unpack(header)
+            if f.tell() + length > size:
+                return end
+            end = f.seek(length, os.SEEK_CUR)
+
+def read_frames(path):
+    """依次返回录制文件中的 (ts, kind, payload)，忽略末尾不完整的帧"""
+    with open(path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"不是有效的录制文件: {path}")
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            ts, kind, length = FRAME_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield ts, kind, payload
+
+def replay(frames, handler, speed=1.0):
+    """按录制时间间隔回放，speed 为倍速，0 表示不等待全速回放
+
+    handler(ts, kind, payload) 处理每一帧，返回 (帧数, 耗时秒数)。
+    """
+    count = 0
+    start = time.perf_counter()
+    first_ts = None
+
+    for ts, kind, payload in frames:
+        if speed > 0:
+            if first_ts is None:
+                first_ts = ts
+            wait = (ts - first_ts) / speed - (time.perf_counter() - start)
+            if wait > 0:
+                time.sleep(wait)
+        handler(ts, kind, payload)
+        count += 1
+
+    return count, time.perf_counter() - start
@@ -0,0 +1,342 @@
+import multiprocessing
+import time
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+import stats_pb2
+from stats_records import TRAFFIC_REGEX
+from stats_groups import GroupIndex
+
+# 小于该大小的响应直接在主进程解析（字节）
+SHARD_MIN_BYTES = 1 << 20
+# QueryStatsResponse.stat 和 Stat.name 的字段头: 字段号 1，长度前缀类型
+STAT_FIELD_TAG = 0x0A
+# Stat.value 的字段头: 字段号 2，varint 类型
+VALUE_FIELD_TAG = 0x10
+# 对齐分段边界时连续校验的条目数
+SYNC_FRAMES = 4
+# 对齐分段边界时最多向后查找的字节数
+SYNC_WINDOW = 1 << 16
+
+def _varint(buf, pos, end):
+    """读取 varint，返回 (值, 结束位置)，数据不完整时返回 (None, end)"""
+    result = 0
+    shift = 0
+    while pos < end:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+    return None, end
+
+def _frame_end(buf, pos, end):
+    """pos 处是一个结构完整的 Stat 条目时返回其结束位置，否则返回 -1"""
+    if pos >= end or buf[pos] != STAT_FIELD_TAG:
+        return -1
+    length, p = _varint(buf, pos + 1, end)
+    if length is None or length < 2 or p + length > end:
+        return -1
+    frame_end = p + length
+
+    # name 必有，value 为 0 时省略
+    if buf[p] != STAT_FIELD_TAG:
+        return -1
+    name_length, q = _varint(buf, p + 1, frame_end)
+    if name_length is None or q + name_length > frame_end:
+        return -1
+    name_end = q + name_length
+    if b">>>" not in buf[q:name_end]:
+        return -1
+    if name_end < frame_end:
+        if buf[name_end] != VALUE_FIELD_TAG:
+            return -1
+        _, r = _varint(buf, name_end + 1, frame_end)
+        if r != frame_end:
+            return -1
+    return frame_end
+
+def _sync(buf, pos, n):
+    """返回不早于 pos 的第一个 Stat 条目起点
+
+    从候选位置起连续若干条目的结构都合法才认为对齐。相邻分段对同一
+    偏移得到相同的结果，因此各工作进程可以各自确定边界，主进程不必
+    先扫描一遍。repeated 字段的任意连续条目本身也是合法的
+    QueryStatsResponse，每段都可以单独反序列化。
+    """
+    if pos <= 0:
+        return 0
+    if pos >= n:
+        return n
+    window = bytes(buf[pos:min(n, pos + SYNC_WINDOW)])
+    end = len(window)
+    start = window.find(STAT_FIELD_TAG)
+    while start >= 0:
+        p = start
+        for _ in range(SYNC_FRAMES):
+            if pos + p == n:
+                break
+            p = _frame_end(window, p, end)
+            if p < 0:
+                break
+        if p >= 0:
+            return pos + start
+        start = window.find(STAT_FIELD_TAG, start + 1)
+    raise ValueError(f"偏移 {pos} 之后找不到 Stat 条目边界")
+
+def _zero(buf):
+    """原地清零 array 或 bytearray"""
+    with memoryview(buf) as view, view.cast("B") as raw:
+        raw[:] = bytes(len(raw))
+
+class ShardState:
+    """分片解析在进程内持久保存的状态
+
+    统计项名称 -> 槽位（2 * 记录下标 + 方向）的映射在轮询间复用，流量
+    累加到复用的 array('q') 中，seen 标记本轮出现过的记录。每轮只把新
+    出现的 (resource, tag) 交给主进程，主进程据此把本地记录下标映射到
+    全局下标，之后只需按下标合并数组。
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.slots = {}
+        self.records = {}
+        self.values = array("q")
+        self.seen = bytearray()
+
+    def _learn(self, name, new):
+        slot = -1
+        match = TRAFFIC_REGEX.match(name)
+        if match:
+            resource, tag, direction = match.groups()
+            key = (resource, tag)
+            index = self.records.get(key)
+            if index is None:
+                index = self.records[key] = len(self.seen)
+                self.values.extend((0, 0))
+                self.seen.append(0)
+                new.append(key)
+            slot = 2 * index + (0 if direction == "uplink" else 1)
+        self.slots[name] = slot
+        return slot
+
+    def aggregate(self, data, shards=1, reset=False):
+        """解析一段数据，返回 (是否已重置, 新记录列表)，流量留在 values 和 seen 中"""
+        response = stats_pb2.QueryStatsResponse.FromString(data)
+        # 分段按字节均分，每个进程最终会见到全部名称，
+        # 因此按估算的名称总数（而不是本段大小）判断是否需要重建
+        if reset or len(self.slots) > 4 * len(response.stat) * shards + 4096:
+            self.reset()
+            reset = True
+        else:
+            _zero(self.values)
+            _zero(self.seen)
+
+        slots = self.slots
+        values = self.values
+        seen = self.seen
+        new = []
+        for stat in response.stat:
+            slot = slots.get(stat.name)
+            if slot is None:
+                slot = self._learn(stat.name, new)
+            if slot < 0:
+                continue
+            values[slot] += stat.value
+            seen[slot >> 1] = 1
+        return reset, new
+
+def _worker(conn):
+    """工作进程入口：固定处理同一分片，解析状态在轮询间保留"""
+    state = ShardState()
+    segment = None
+    reset = False
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        name, size, index, shards, force = task
+        started = time.process_time()
+        try:
+            if segment is None or segment.name != name:
+                if segment is not None:
+                    segment.close()
+                segment = shared_memory.SharedMemory(name=name)
+            start = _sync(segment.buf, size * index // shards, size)
+            end = _sync(segment.buf, size * (index + 1) // shards, size)
+            reset, new = state.aggregate(bytes(segment.buf[start:end]), shards, reset or force)
+        except Exception as e:
+            # 已学到的新名称没有交给主进程，下一轮整体重建
+            state.reset()
+            reset = True
+            conn.send(e)
+            continue
+        conn.send((reset, new, time.process_time() - started))
+        conn.send_bytes(state.values)
+        conn.send_bytes(state.seen)
+        reset = False
+    if segment is not None:
+        segment.close()
+
+class ShardedParser:
+    """多进程分片解析 QueryStatsResponse
+
+    主进程把原始响应字节写入共享内存，每个工作进程固定负责一个分片，
+    从均分的偏移处自行对齐到条目边界，反序列化后把流量写入进程内复用的
+    数组（见 ShardState），只回传新出现的记录和数组的原始字节。主进程
+    用 numpy 按下标映射合并各分片，再按分组成员下标汇总分组流量。
+    工作进程应在创建 gRPC 通道之前启动，避免 fork 时复制 gRPC 的内部
+    线程状态。同一个解析器应始终写入同一个 TrafficTable。
+    """
+    def __init__(self, processes=None, groups=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.workers = []
+        if self.processes > 1:
+            # 先启动资源跟踪进程，让工作进程共用它，否则各自的跟踪进程退出时会删除共享内存
+            resource_tracker.ensure_running()
+            for _ in range(self.processes):
+                conn, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_worker, args=(child,), daemon=True)
+                process.start()
+                child.close()
+                self.workers.append((process, conn))
+        self.segment = None
+        # 小响应直接在主进程解析，作为最后一个分片来源
+        self.local = ShardState()
+        self.groups = GroupIndex(groups) if groups else None
+        # 上一轮各工作进程解析所用的 CPU 时间（秒）
+        self.worker_cpu = []
+        self._clear()
+
+    def _clear(self):
+        """清空全局记录表，各分片在下一轮重新上报全部名称"""
+        # (resource, tag) -> 全局下标
+        self.ids = {}
+        # 全局下标 -> TrafficRecord
+        self.records = []
+        # 分片来源 -> 本地记录下标到全局下标的映射
+        self.remaps = [np.zeros(0, dtype=np.int64) for _ in range(len(self.workers) + 1)]
+        self.pending_reset = [True] * len(self.workers)
+        self.local.reset()
+        # 分组 -> 成员的全局下标
+        self.members = {}
+        self.member_arrays = {}
+        if self.groups:
+            self.groups.expire()
+            self.groups.expire()
+            self.members = {name: [] for name in self.groups.totals}
+
+    def _global(self, key, table):
+        """返回记录的全局下标，首次出现时登记记录和所属分组"""
+        index = self.ids.get(key)
+        if index is None:
+            index = self.ids[key] = len(self.records)
+            self.records.append(table.record(*key))
+            if self.groups:
+                for group in self.groups.groups_for((key[0], key[1], "uplink")):
+                    self.members[group.tag].append(index)
+                    self.member_arrays.pop(group.tag, None)
+        return index
+
+    def _shared(self, payload):
+        """将数据写入共享内存，容量不足时重新分配"""
+        size = len(payload)
+        if self.segment is None or self.segment.size < size:
+            self._release()
+            self.segment = shared_memory.SharedMemory(create=True, size=max(size + size // 2, 1))
+        self.segment.buf[:size] = payload
+        return self.segment.name
+
+    def _release(self):
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+    def _collect(self, payload):
+        """运行各分片，返回 [(来源, 是否已重置, 新记录, 流量数组, 出现标记), ...]"""
+        if len(payload) < SHARD_MIN_BYTES or not self.workers:
+            source = len(self.workers)
+            reset, new = self.local.aggregate(payload)
+            values = np.array(self.local.values, dtype=np.int64)
+            seen = np.frombuffer(bytes(self.local.seen), dtype=np.uint8)
+            return [(source, reset, new, values, seen)], None
+
+        name = self._shared(payload)
+        shards = len(self.workers)
+        for i, (_, conn) in enumerate(self.workers):
+            conn.send((name, len(payload), i, shards, self.pending_reset[i]))
+            self.pending_reset[i] = False
+
+        results = []
+        error = None
+        self.worker_cpu = []
+        for i, (_, conn) in enumerate(self.workers):
+            header = conn.recv()
+            if isinstance(header, Exception):
+                error = error or header
+                continue
+            reset, new, cpu = header
+            values = np.frombuffer(conn.recv_bytes(), dtype=np.int64)
+            seen = np.frombuffer(conn.recv_bytes(), dtype=np.uint8)
+            self.worker_cpu.append(cpu)
+            results.append((i, reset, new, values, seen))
+        return results, error
+
+    def parse(self, payload, table):
+        """解析原始响应字节，结果写入 TrafficTable，返回分组汇总 {name: [up, down]}"""
+        results, error = self._collect(payload)
+
+        # 登记新记录，出错时也要登记，否则分片与主进程的下标映射不一致
+        for source, reset, new, _, _ in results:
+            remap = self.remaps[source] if not reset else self.remaps[source][:0]
+            if new:
+                added = np.fromiter((self._global(key, table) for key in new), dtype=np.int64, count=len(new))
+                remap = np.concatenate((remap, added))
+            self.remaps[source] = remap
+        if error is not None:
+            raise error
+
+        size = len(self.records)
+        totals = np.zeros((size, 2), dtype=np.int64)
+        present = np.zeros(size, dtype=bool)
+        for source, _, _, values, seen in results:
+            remap = self.remaps[source]
+            totals[remap] += values.reshape(-1, 2)
+            present[remap] |= seen.astype(bool)
+
+        table.begin()
+        generation = table.generation
+        records = self.records
+        active = np.flatnonzero(present)
+        for index, uplink, downlink in zip(active.tolist(), totals[active, 0].tolist(), totals[active, 1].tolist()):
+            record = records[index]
+            record.generation = generation
+            record.uplink = uplink
+            record.downlink = downlink
+
+        group_totals = {}
+        for name, members in self.members.items():
+            array_ = self.member_arrays.get(name)
+            if array_ is None:
+                array_ = self.member_arrays[name] = np.array(members, dtype=np.int64)
+            uplink, downlink = totals[array_].sum(axis=0).tolist() if len(array_) else (0, 0)
+            group_totals[name] = [uplink, downlink]
+
+        # 表清理后已登记的记录对象可能失效，全部重新登记
+        if table.prune(len(active)):
+            self._clear()
+        return group_totals
+
+    def close(self):
+        for process, conn in self.workers:
+            conn.send(None)
+            process.join()
+            conn.close()
+        self.workers = []
+        self._release()
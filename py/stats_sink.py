@@ -0,0 +1,152 @@
+import sqlite3
+import time
+
+# 汇总粒度（秒）
+HOUR = 3600
+DAY = 86400
+
+# 固定时区偏移（秒），None 表示按每个时间戳的本地时区（含夏令时）计算
+UTC_OFFSET = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    id         INTEGER PRIMARY KEY,
+    resource   TEXT    NOT NULL,
+    tag        TEXT    NOT NULL,
+    direction  TEXT    NOT NULL,
+    last_value INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (resource, tag, direction)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    counter_id INTEGER NOT NULL,
+    ts         INTEGER NOT NULL,
+    value      INTEGER NOT NULL,
+    PRIMARY KEY (counter_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_hourly (
+    counter_id INTEGER NOT NULL,
+    bucket     INTEGER NOT NULL,
+    value      INTEGER NOT NULL,
+    PRIMARY KEY (counter_id, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_daily (
+    counter_id INTEGER NOT NULL,
+    bucket     INTEGER NOT NULL,
+    value      INTEGER NOT NULL,
+    PRIMARY KEY (counter_id, bucket)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts);
+CREATE INDEX IF NOT EXISTS rollup_hourly_bucket ON rollup_hourly (bucket);
+CREATE INDEX IF NOT EXISTS rollup_daily_bucket ON rollup_daily (bucket);
+"""
+
+def _upsert_sql(table, column):
+    """生成累加写入语句，同一主键重复写入时数值相加"""
+    return (
+        f"INSERT INTO {table} (counter_id, {column}, value) VALUES (?, ?, ?) "
+        f"ON CONFLICT (counter_id, {column}) DO UPDATE SET value = value + excluded.value"
+    )
+
+INSERT_SAMPLE = _upsert_sql("samples", "ts")
+UPSERT_HOURLY = _upsert_sql("rollup_hourly", "bucket")
+UPSERT_DAILY = _upsert_sql("rollup_daily", "bucket")
+UPDATE_LAST = "UPDATE counters SET last_value = ? WHERE id = ?"
+
+def local_offset(ts):
+    """时间戳所在时刻的本地时区偏移（秒），夏令时期间会变化"""
+    return time.localtime(ts).tm_gmtoff
+
+def hour_bucket(ts, utc_offset=UTC_OFFSET):
+    """返回时间戳所在本地小时的起始时间"""
+    if utc_offset is None:
+        utc_offset = local_offset(ts)
+    return ts - (ts + utc_offset) % HOUR
+
+def day_bucket(ts, utc_offset=UTC_OFFSET):
+    """返回时间戳所在本地日期的起始时间"""
+    if utc_offset is None:
+        # 夏令时切换当天零点的偏移可能与 ts 不同，按本地日期重新换算
+        t = time.localtime(ts)
+        return int(time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 0, 0, 0, 0, 0, -1)))
+    return ts - (ts + utc_offset) % DAY
+
+class SQLiteSink:
+    """将每次轮询的增量写入 SQLite（WAL 模式），并增量维护小时/天汇总表"""
+    def __init__(self, path, utc_offset=UTC_OFFSET):
+        self.utc_offset = utc_offset
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        # (resource, tag, direction) -> counter_id
+        self.counter_ids = {}
+        self._load_counter_ids()
+
+    def _load_counter_ids(self):
+        """从维度表加载计数器 ID 缓存"""
+        self.counter_ids = {
+            (resource, tag, direction): counter_id
+            for counter_id, resource, tag, direction in self.conn.execute(
+                "SELECT id, resource, tag, direction FROM counters"
+            )
+        }
+
+    def load_last_values(self):
+        """读取上次写入的累计值，用于监控重启后继续计算增量"""
+        return {
+            (resource, tag, direction): value
+            for resource, tag, direction, value in self.conn.execute(
+                "SELECT resource, tag, direction, last_value FROM counters"
+            )
+        }
+
+    def _counter_id(self, key):
+        """获取计数器维度 ID，不存在时新建"""
+        counter_id = self.counter_ids.get(key)
+        if counter_id is None:
+            cursor = self.conn.execute(
+                "INSERT INTO counters (resource, tag, direction) VALUES (?, ?, ?)", key
+            )
+            counter_id = cursor.lastrowid
+            self.counter_ids[key] = counter_id
+        return counter_id
+
+    def write(self, changes, ts=None):
+        """在一个事务内写入一次轮询的增量 [(key, delta, value), ...]"""
+        if not changes:
+            return 0
+
+        ts = int(ts if ts is not None else time.time())
+        hour = hour_bucket(ts, self.utc_offset)
+        day = day_bucket(ts, self.utc_offset)
+
+        try:
+            with self.conn:
+                self._write(changes, ts, hour, day)
+        except sqlite3.Error:
+            # 事务已回滚，新分配的 ID 可能无效，重新加载缓存
+            self._load_counter_ids()
+            raise
+
+        return len(changes)
+
+    def _write(self, changes, ts, hour, day):
+        samples = []
+        hourly = []
+        daily = []
+        last_values = []
+        for key, delta, value in changes:
+            counter_id = self._counter_id(key)
+            samples.append((counter_id, ts, delta))
+            hourly.append((counter_id, hour, delta))
+            daily.append((counter_id, day, delta))
+            last_values.append((value, counter_id))
+
+        self.conn.executemany(INSERT_SAMPLE, samples)
+        self.conn.executemany(UPSERT_HOURLY, hourly)
+        self.conn.executemany(UPSERT_DAILY, daily)
+        self.conn.executemany(UPDATE_LAST, last_values)
+
+    def close(self):
+        self.conn.close()